@@ -1,10 +1,22 @@
 import argparse
+import functools
+import hashlib
+import itertools
+import math
 import logging
+import multiprocessing
+from multiprocessing import util as mp_util
+import os
+import re
+import tempfile
 import time
+from collections import Counter, deque
 import numpy as np
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
+import ijson
 import nltk
 from bs4 import BeautifulSoup
 from selenium import webdriver
@@ -14,7 +26,14 @@ from torch.utils.data import Dataset, DataLoader
 import json
 # Configure Logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-nltk.download('punkt')
+HTML_CACHE_DIR = ".html_cache"
+# Datasets up to this size are batched straight from device tensors; larger ones stream through a DataLoader.
+MAX_ON_DEVICE_BYTES = 512 * 1024 ** 2
+# Below this many documents, starting a worker pool costs more than tokenizing serially.
+PARALLEL_TOKENIZE_MIN_DOCS = 2000
+# float16 represents every integer up to 2048 exactly, so BoW counts are clipped there before the cast.
+MAX_BOW_COUNT = 2048
+_WORD_RE = re.compile(r"[A-Za-z']+")
 
 
 # ------------------------
@@ -26,27 +45,51 @@ class WebScraper:
         self.proxy = proxy
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        # One headless Chrome is started lazily and reused for every fetch.
+        self._driver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _ensure_driver(self):
+        """Start the headless Chrome instance if it isn't running yet."""
+        if self._driver is None:
+            chrome_options = Options()
+            chrome_options.add_argument("--headless")
+            chrome_options.add_argument("--disable-gpu")
+            chrome_options.add_argument("--no-sandbox")
+            if self.proxy:
+                chrome_options.add_argument(f"--proxy-server={self.proxy}")
+            self._driver = webdriver.Chrome(options=chrome_options)
+        return self._driver
 
     def fetch(self, url):
         """Fetch HTML content from a webpage."""
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        if self.proxy:
-            chrome_options.add_argument(f"--proxy-server={self.proxy}")
-
         for attempt in range(self.max_retries):
             try:
-                with webdriver.Chrome(options=chrome_options) as driver:
-                    driver.get(url)
-                    logging.info(f"Successfully fetched the page: {url}")
-                    return driver.page_source
+                driver = self._ensure_driver()
+                driver.get(url)
+                logging.info(f"Successfully fetched the page: {url}")
+                return driver.page_source
             except WebDriverException as e:
                 logging.error(f"Attempt {attempt + 1} failed: {e}")
+                self.close()  # Start from a fresh browser on the next attempt
                 time.sleep(self.retry_delay)
         raise Exception(f"Failed to fetch {url} after {self.max_retries} attempts.")
 
+    def close(self):
+        """Quit the browser, if one was started."""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except WebDriverException as e:
+                logging.warning(f"Failed to shut down the browser cleanly: {e}")
+            finally:
+                self._driver = None
+
 
 # ------------------------
 # Text Classification Models
@@ -72,20 +115,39 @@ class TextCNN(nn.Module):
     def __init__(self, vocab_size, embedding_dim=100, num_filters=100, filter_sizes=[3, 4, 5]):
         super(TextCNN, self).__init__()
         self.embedding = nn.Embedding(vocab_size, embedding_dim)
-        self.convs = nn.ModuleList([
-            nn.Conv2d(1, num_filters, (fs, embedding_dim))
-            for fs in filter_sizes
-        ])
+        # All filter sizes share one Conv1d as wide as the largest filter; taps beyond a
+        # filter's own size are masked to zero, so each channel group acts as its own conv.
+        self.max_filter_size = max(filter_sizes)
+        self.pad = max(filter_sizes) - min(filter_sizes)
+        self.conv = nn.Conv1d(embedding_dim, num_filters * len(filter_sizes), max(filter_sizes))
+        # Initialize each group as a standalone Conv1d of its own width, so its fan-in is fs * embedding_dim.
+        with torch.no_grad():
+            self.conv.weight.zero_()
+            for group, fs in enumerate(filter_sizes):
+                branch = nn.Conv1d(embedding_dim, num_filters, fs)
+                rows = slice(group * num_filters, (group + 1) * num_filters)
+                self.conv.weight[rows, :, :fs] = branch.weight
+                self.conv.bias[rows] = branch.bias
+        sizes = torch.tensor(filter_sizes).repeat_interleave(num_filters)
+        self.register_buffer("kernel_mask", (torch.arange(max(filter_sizes)) < sizes.unsqueeze(1)).float().unsqueeze(1),
+                             persistent=False)
+        self.register_buffer("trim", sizes - min(filter_sizes), persistent=False)
         self.dropout = nn.Dropout(0.5)
         self.fc = nn.Linear(num_filters * len(filter_sizes), 1)
 
     def forward(self, x):
-        # x: [batch_size, seq_len]
-        x = self.embedding(x)          # [batch_size, seq_len, embedding_dim]
-        x = x.unsqueeze(1)             # [batch_size, 1, seq_len, embedding_dim]
-        conv_results = [torch.relu(conv(x)).squeeze(3) for conv in self.convs]
-        pooled = [torch.max(result, dim=2)[0] for result in conv_results]
-        features = torch.cat(pooled, dim=1)
+        # x: [batch_size, seq_len] (a trailing channel dimension of size 1 is dropped)
+        x = x.reshape(x.size(0), -1)
+        if x.size(1) < self.max_filter_size:
+            raise ValueError(f"Sequence length {x.size(1)} is shorter than the largest filter size "
+                             f"({self.max_filter_size}); increase max_len.")
+        x = self.embedding(x).transpose(1, 2)  # [batch_size, embedding_dim, seq_len]
+        x = F.pad(x, (0, self.pad))            # right-pad so the smallest filter sees every window
+        x = torch.relu(F.conv1d(x, self.conv.weight * self.kernel_mask, self.conv.bias))
+        # Larger filters have fewer valid windows; zero the ones that overrun the real sequence.
+        positions = torch.arange(x.size(2), device=x.device)
+        valid = positions < (x.size(2) - self.trim).unsqueeze(1)
+        features = x.masked_fill(~valid, 0).amax(dim=2)
         features = self.dropout(features)
         out = self.fc(features)        # [batch_size, 1]
         return out
@@ -97,33 +159,174 @@ class TextCNN(nn.Module):
 class ReviewDataset(Dataset):
     """Custom Dataset for review samples."""
     def __init__(self, sequences, labels):
-        self.sequences = sequences
-        self.labels = labels
+        # Convert once up front so __getitem__ only slices existing tensors.
+        # Float inputs (FNN bag-of-words counts) keep their dtype; token ids become long.
+        sequences = np.ascontiguousarray(sequences)
+        dtype = None if np.issubdtype(sequences.dtype, np.floating) else torch.long
+        self.sequences = torch.as_tensor(sequences, dtype=dtype)
+        # For FNN (CrossEntropyLoss) we use integer labels.
+        self.labels = torch.as_tensor(labels, dtype=torch.long)
 
     def __len__(self):
         return len(self.sequences)
 
     def __getitem__(self, idx):
-        sequence = torch.tensor(self.sequences[idx], dtype=torch.long)
-        # For FNN (CrossEntropyLoss) we use integer labels.
-        label = torch.tensor(self.labels[idx], dtype=torch.long)
-        return sequence, label
+        return self.sequences[idx], self.labels[idx]
 
 
 # ------------------------
 # Utility Functions for Scraping and Preprocessing
 # ------------------------
-def scrape_text_from_url(url, proxy=None):
+def _cache_path(url, ext):
+    """Returns the on-disk cache path for a URL, keyed by its SHA-1 hash."""
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(HTML_CACHE_DIR, f"{key}.{ext}")
+
+
+def _write_cache_file(path, content):
+    """
+    Writes a cache entry atomically: the content goes to a temporary file in HTML_CACHE_DIR that is
+    then renamed over `path`, so an interrupted run or a concurrent worker never leaves a partial file.
+    """
+    os.makedirs(HTML_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=HTML_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def fetch_cached(url, proxy=None, scraper=None):
+    """
+    Fetches HTML for a URL, reusing a copy cached on disk when available.
+    Pass a WebScraper to reuse its browser; otherwise a temporary one is started.
+    """
+    path = _cache_path(url, "html")
+    if os.path.exists(path):
+        logging.info(f"Loaded cached HTML for: {url}")
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    if scraper is not None:
+        html = scraper.fetch(url)
+    else:
+        with WebScraper(proxy=proxy) as scraper:
+            html = scraper.fetch(url)
+    _write_cache_file(path, html)
+    return html
+
+
+def scrape_text_from_url(url, proxy=None, scraper=None):
     """Scrapes text from a webpage."""
-    scraper = WebScraper(proxy=proxy)
-    html = scraper.fetch(url)
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.get_text(strip=True)
+    path = _cache_path(url, "txt")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    html = fetch_cached(url, proxy, scraper)
+    soup = BeautifulSoup(html, "lxml")
+    text = soup.get_text(strip=True)
+    _write_cache_file(path, text)
+    return text
+
+
+# Per-process scraper used by _scrape_worker, so each pool worker keeps one browser open.
+_worker_scraper = None
+
+
+def _init_scrape_worker(proxy):
+    """Pool initializer: starts this worker's WebScraper and quits its browser on exit."""
+    global _worker_scraper
+    _worker_scraper = WebScraper(proxy=proxy)
+    mp_util.Finalize(_worker_scraper, _worker_scraper.close, exitpriority=10)
+
+
+def _scrape_job(job, scraper):
+    """Scrapes one (url, label) job with `scraper` and returns (url, label, text, error)."""
+    url, label = job
+    try:
+        return url, label, scrape_text_from_url(url, scraper.proxy, scraper), None
+    except Exception as e:
+        # Send back the message only: not every exception survives pickling through the pool.
+        return url, label, None, str(e)
+
+
+def _scrape_worker(job):
+    """Pool worker: scrapes one job with this process's persistent WebScraper."""
+    return _scrape_job(job, _worker_scraper)
+
+
+def _scrape_all(jobs, proxy=None):
+    """
+    Yields (url, label, text, error) for every job, in job order. Selenium is not thread-safe, so
+    several URLs are fetched by worker processes that each reuse one browser; a single URL is
+    scraped in this process rather than paying for a worker start.
+    """
+    if not jobs:
+        return
+    if len(jobs) == 1:
+        with WebScraper(proxy=proxy) as scraper:
+            yield _scrape_job(jobs[0], scraper)
+        return
+    with multiprocessing.Pool(processes=min(8, len(jobs)), initializer=_init_scrape_worker,
+                              initargs=(proxy,)) as pool:
+        yield from pool.imap(_scrape_worker, jobs)
+        # Let workers exit normally (rather than terminate) so their browsers are quit.
+        pool.close()
+        pool.join()
+
+
+def ensure_punkt():
+    """Downloads the NLTK Punkt sentence tokenizer ('punkt_tab') only if it isn't installed yet."""
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        nltk.download('punkt_tab', quiet=True)
 
 
 def preprocess_text(text):
     """Tokenizes text into sentences using NLTK."""
-    return nltk.sent_tokenize(text)
+    try:
+        return nltk.sent_tokenize(text)
+    except LookupError:
+        # NLTK releases before 3.8.2 load the legacy pickled 'punkt' model instead of 'punkt_tab'.
+        nltk.download('punkt', quiet=True)
+        return nltk.sent_tokenize(text)
+
+
+@functools.lru_cache(maxsize=200_000)
+def _cached_stem(word):
+    """Memoized wrapper around nltk_utils.stem; token frequencies are heavily skewed."""
+    from nltk_utils import stem
+    return stem(word)
+
+
+def _tok_stem(text):
+    """Pool worker: lowercases, tokenizes and stems one document."""
+    return [_cached_stem(word) for word in _WORD_RE.findall(text.lower())]
+
+
+def tokenize_texts(texts):
+    """
+    Tokenizes and stems every document, returning (tokenized_texts, token_counts).
+    Large corpora are spread over a process pool, one worker per core.
+    """
+    tokenized_texts = []
+    freq = Counter()
+    workers = os.cpu_count() or 1
+    if workers > 1 and len(texts) >= PARALLEL_TOKENIZE_MIN_DOCS:
+        with multiprocessing.Pool(processes=workers) as pool:
+            results = pool.imap(_tok_stem, texts, chunksize=max(1, len(texts) // (4 * workers)))
+            for stemmed_tokens in results:
+                tokenized_texts.append(stemmed_tokens)
+                freq.update(stemmed_tokens)
+    else:
+        for text in texts:
+            stemmed_tokens = _tok_stem(text)
+            tokenized_texts.append(stemmed_tokens)
+            freq.update(stemmed_tokens)
+    return tokenized_texts, freq
 
 
 def split_into_samples(text, sample_size=1000):
@@ -140,171 +343,161 @@ def build_dataset(pos_urls: list, neg_urls: list, proxy: str = None,
     texts = []
     labels = []
 
-    for url in pos_urls:
-        try:
-            text = scrape_text_from_url(url, proxy)
-            samples = split_into_samples(text)
-            texts.extend(samples)
-            labels.extend([1] * len(samples))
-            logging.info(f"Scraped {len(samples)} samples from positive URL: {url}")
-        except Exception as e:
-            logging.error(f"Error scraping positive URL {url}: {e}")
-
-    for url in neg_urls:
-        try:
-            text = scrape_text_from_url(url, proxy)
-            samples = split_into_samples(text)
-            texts.extend(samples)
-            labels.extend([0] * len(samples))
-            logging.info(f"Scraped {len(samples)} samples from negative URL: {url}")
-        except Exception as e:
-            logging.error(f"Error scraping negative URL {url}: {e}")
+    jobs = [(url, 1) for url in pos_urls] + [(url, 0) for url in neg_urls]
+    for url, label, text, error in _scrape_all(jobs, proxy):
+        kind = "positive" if label == 1 else "negative"
+        if error is not None:
+            logging.error(f"Error scraping {kind} URL {url}: {error}")
+            continue
+        samples = split_into_samples(text)
+        texts.extend(samples)
+        labels.extend([label] * len(samples))
+        logging.info(f"Scraped {len(samples)} samples from {kind} URL: {url}")
 
     # Build vocabulary from texts
-    tokenized_texts = []
-    all_tokens = []
-    from nltk_utils import stem
-    for text in texts:
-        tokens = [word.lower() for word in nltk.word_tokenize(text)]
-        stemmed_tokens = [stem(word) for word in tokens]  # Stem tokens here!
-        tokenized_texts.append(stemmed_tokens)
-        all_tokens.extend(stemmed_tokens)
-    freq_dist = nltk.FreqDist(all_tokens)
-    vocab_common = freq_dist.most_common(vocab_size - 1)  # Reserve index 0 for padding
-    word_to_idx = {'<PAD>': 0}
-    for word, _ in vocab_common:
-        word_to_idx[word] = len(word_to_idx)
-
-    sequences = []
-    for tokens in tokenized_texts:
-        seq = [word_to_idx.get(word, 0) for word in tokens][:max_len]
-        if len(seq) < max_len:
-            seq += [0] * (max_len - len(seq))
-        sequences.append(seq)
+    tokenized_texts, freq = tokenize_texts(texts)  # Stem tokens here!
+    vocab_common = freq.most_common(vocab_size - 1)  # Reserve index 0 for padding
+    word_to_idx = {'<PAD>': 0, **{word: i + 1 for i, (word, _) in enumerate(vocab_common)}}
+
+    sequences = np.zeros((len(tokenized_texts), max_len), dtype=np.int64)  # 0 is <PAD>
+    for i, tokens in enumerate(tokenized_texts):
+        ids = list(map(word_to_idx.get, tokens[:max_len], itertools.repeat(0)))
+        sequences[i, :len(ids)] = ids
 
     # Reshape data based on model type.
     if model.upper() == "FNN":
         # For FNN, use BoW representation (vocab_size features)
         X = np.zeros((len(texts), vocab_size), dtype=np.int32)
         for i, tokens in enumerate(tokenized_texts):
-            for word in tokens:
-                idx = word_to_idx.get(word, 0)
-                if idx < vocab_size:
-                    X[i, idx] += 1  # Count word occurrences
+            idx_arr = np.fromiter((word_to_idx.get(word, 0) for word in tokens), dtype=np.int32, count=len(tokens))
+            X[i] = np.bincount(idx_arr[idx_arr < vocab_size], minlength=vocab_size)  # Count word occurrences
+        # Counts are clipped to MAX_BOW_COUNT so the float16 cast stays exact and can't overflow.
+        X = np.minimum(X, MAX_BOW_COUNT).astype(np.float16)
     elif model.upper() == "CNN":
         # For CNN, add an extra channel dimension.
-        X = np.array(sequences)
-        X = X[..., np.newaxis]
+        X = sequences[..., np.newaxis]
     else:
         logging.warning(f"Model type '{model}' not recognized. Returning unmodified sequence data.")
+        X = sequences
     y = np.array(labels)
     return X, y, word_to_idx
 def flatten_html_json(node, default_label=None):
     """
-    Recursively traverse a nested HTML JSON tree and extract text and labels.
+    Traverse a nested HTML JSON tree and extract text and labels.
     Assumes that nodes may have a "text" key (or you can derive text from them),
     and optionally a "label" key. If no "label" exists, it uses default_label or
     the node's tag name as a fallback.
     """
     texts = []
     labels = []
-
-    # If the node has a "text" field, extract it.
-    # (You might modify this if your structure stores text differently.)
-    text = node.get("text", None)
-    if text:
-        texts.append(text)
-        # Use the provided label if available, otherwise fall back on default_label or the tag.
-        label = node.get("label", default_label if default_label is not None else node.get("tag"))
-        labels.append(label)
-
-    # Process children recursively.
-    for child in node.get("children", []):
-        child_texts, child_labels = flatten_html_json(child, default_label=default_label)
-        texts.extend(child_texts)
-        labels.extend(child_labels)
+    texts_append = texts.append
+    labels_append = labels.append
+
+    # Walk the tree with an explicit stack so deep documents can't hit the recursion limit.
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        # If the node has a "text" field, extract it.
+        # (You might modify this if your structure stores text differently.)
+        text = current.get("text", None)
+        if text:
+            texts_append(text)
+            # Use the provided label if available, otherwise fall back on default_label or the tag.
+            labels_append(current.get("label", default_label if default_label is not None else current.get("tag")))
+        # Push children in reverse so they are visited in document order.
+        stack.extend(reversed(current.get("children", [])))
 
     return texts, labels
-def build_dataset_from_json(json_file, max_len=50, vocab_size=1000, model="FNN"):
-    import json
-    import nltk
-    from nltk.tokenize import word_tokenize
-    from nltk_utils import stem  # assuming you have a stemming utility
-    import numpy as np
-    import logging
 
-    # Load JSON file
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
 
+def _scan_json_layout(f):
+    """
+    Stream over the top level of a JSON file and work out which dataset layout it uses
+    ("list", "data" or "tree"), along with any scalar fields set on the root object.
+    """
+    keys = set()
+    root_fields = {}
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if prefix == "":
+            if event == "start_array":
+                return "list", root_fields
+            if event == "map_key":
+                keys.add(value)
+                if value == "data":
+                    return "data", root_fields
+        elif prefix in ("tag", "text", "label") and event not in ("start_map", "start_array", "map_key"):
+            root_fields[prefix] = value
+    if "tag" in keys and "children" in keys:
+        return "tree", root_fields
+    return None, root_fields
+
+
+def build_dataset_from_json(json_file, max_len=50, vocab_size=1000, model="FNN"):
     texts = []
     labels = []
-    # Case 1: The JSON is structured as {"data": [ ... ]}
-    if isinstance(data, dict) and "data" in data:
-        data_list = data["data"]
-    # Case 2: The JSON is a list of entries with "text" and "label" keys
-    elif isinstance(data, list):
-        data_list = data
-    # Case 3: The JSON is a nested HTML tree exported by your parser
-    elif isinstance(data, dict) and "tag" in data and "children" in data:
-        # Flatten the nested tree. Adjust default_label as needed.
-        texts, labels = flatten_html_json(data, default_label="unknown")
-        data_list = None  # We've already extracted texts and labels.
-    else:
-        raise ValueError("JSON file format is invalid. It must be a list, contain a 'data' key with a list, or be a nested tree.")
-
-    # If we have a list structure, extract text and label from each entry.
-    if data_list is not None:
-        for entry in data_list:
-            # Use .get() to safely extract keys; log a warning if missing.
-            text = entry.get("text")
-            label = entry.get("label")
-            if text is None or label is None:
-                logging.warning(f"Skipping entry due to missing fields: {entry}")
-                continue
-            texts.append(text)
-            labels.append(label)
+    data_list = None
+    # Stream the JSON file instead of loading the whole tree into memory.
+    with open(json_file, 'rb') as f:
+        layout, root_fields = _scan_json_layout(f)
+        f.seek(0)
+        # Case 1: The JSON is structured as {"data": [ ... ]}
+        if layout == "data":
+            data_list = ijson.items(f, 'data.item', use_float=True)
+        # Case 2: The JSON is a list of entries with "text" and "label" keys
+        elif layout == "list":
+            data_list = ijson.items(f, 'item', use_float=True)
+        # Case 3: The JSON is a nested HTML tree exported by your parser
+        elif layout == "tree":
+            # Flatten the nested tree one top-level subtree at a time. Adjust default_label as needed.
+            texts, labels = flatten_html_json(root_fields, default_label="unknown")
+            for child in ijson.items(f, 'children.item', use_float=True):
+                child_texts, child_labels = flatten_html_json(child, default_label="unknown")
+                texts.extend(child_texts)
+                labels.extend(child_labels)
+        else:
+            raise ValueError("JSON file format is invalid. It must be a list, contain a 'data' key with a list, or be a nested tree.")
+
+        # If we have a list structure, extract text and label from each entry as it is parsed.
+        if data_list is not None:
+            for entry in data_list:
+                # Use .get() to safely extract keys; log a warning if missing.
+                text = entry.get("text")
+                label = entry.get("label")
+                if text is None or label is None:
+                    logging.warning(f"Skipping entry due to missing fields: {entry}")
+                    continue
+                texts.append(text)
+                labels.append(label)
 
     if len(texts) == 0:
         raise ValueError("No valid entries found in JSON file.")
 
-    # Process text: tokenization and stemming
-    tokenized_texts = []
-    all_tokens = []
-    for text in texts:
-        tokens = [word.lower() for word in word_tokenize(text)]
-        stemmed_tokens = [stem(word) for word in tokens]  # Apply stemming if needed
-        tokenized_texts.append(stemmed_tokens)
-        all_tokens.extend(stemmed_tokens)
-
-    # Build vocabulary based on frequency distribution
-    freq_dist = nltk.FreqDist(all_tokens)
-    vocab_common = freq_dist.most_common(vocab_size - 1)  # Reserve index 0 for padding
-    word_to_idx = {'<PAD>': 0}
-    for word, _ in vocab_common:
-        word_to_idx[word] = len(word_to_idx)
+    # Process text: tokenization and stemming, counting tokens per document as we go
+    tokenized_texts, freq = tokenize_texts(texts)
+
+    # Build vocabulary based on token frequencies
+    vocab_common = freq.most_common(vocab_size - 1)  # Reserve index 0 for padding
+    word_to_idx = {'<PAD>': 0, **{word: i + 1 for i, (word, _) in enumerate(vocab_common)}}
 
     # Create sequences: pad/truncate to max_len
-    sequences = []
-    for tokens in tokenized_texts:
-        seq = [word_to_idx.get(word, 0) for word in tokens][:max_len]
-        if len(seq) < max_len:
-            seq += [0] * (max_len - len(seq))
-        sequences.append(seq)
+    sequences = np.zeros((len(tokenized_texts), max_len), dtype=np.int64)  # 0 is <PAD>
+    for i, tokens in enumerate(tokenized_texts):
+        ids = list(map(word_to_idx.get, tokens[:max_len], itertools.repeat(0)))
+        sequences[i, :len(ids)] = ids
 
     # Prepare dataset based on model type
     if model.upper() == "FNN":
         # For FNN, use a bag-of-words (BoW) representation with vocab_size features.
         X = np.zeros((len(texts), vocab_size), dtype=np.int32)
         for i, tokens in enumerate(tokenized_texts):
-            for word in tokens:
-                idx = word_to_idx.get(word, 0)
-                if idx < vocab_size:
-                    X[i, idx] += 1  # Count occurrences of each word
+            idx_arr = np.fromiter((word_to_idx.get(word, 0) for word in tokens), dtype=np.int32, count=len(tokens))
+            X[i] = np.bincount(idx_arr[idx_arr < vocab_size], minlength=vocab_size)  # Count occurrences of each word
+        # Stored as float16 to halve host-to-device traffic; counts are clipped to MAX_BOW_COUNT
+        # first, since float16 is only exact up to 2048 and overflows to inf past 65504.
+        X = np.minimum(X, MAX_BOW_COUNT).astype(np.float16)
     elif model.upper() == "CNN":
         # For CNN, keep the sequence format (and add an extra channel dimension if needed)
-        X = np.array(sequences)
-        X = X[..., np.newaxis]  # Add channel dimension for CNN
+        X = sequences[..., np.newaxis]  # Add channel dimension for CNN
     else:
         raise ValueError("Model type not recognized. Choose either 'FNN' or 'CNN'.")
 
@@ -315,87 +508,145 @@ def build_dataset_from_json(json_file, max_len=50, vocab_size=1000, model="FNN")
 # ------------------------
 # HTML Parser and Explorer
 # ------------------------
+class Node:
+    """A single element in the parsed HTML tree."""
+    __slots__ = ("tag", "classes", "children")
+
+    def __init__(self, tag, classes=None, children=None):
+        self.tag = tag
+        self.classes = classes or []
+        self.children = children if children is not None else []
+
+    def to_dict(self):
+        """Returns this subtree as plain JSON-serializable dicts."""
+        root = {"tag": self.tag, "classes": self.classes, "children": []}
+        stack = [(self, root)]
+        while stack:
+            node, node_dict = stack.pop()
+            for child in node.children:
+                child_dict = {"tag": child.tag, "classes": child.classes, "children": []}
+                node_dict["children"].append(child_dict)
+                stack.append((child, child_dict))
+        return root
+
+
 class HTMLParser:
     """Parses HTML into a navigable tree structure."""
     def __init__(self, html):
-        self.soup = BeautifulSoup(html, "html.parser")
+        self.soup = BeautifulSoup(html, "lxml")
         self.root = self._build_tree(self.soup)
 
-    def _build_tree(self, element, parent=None):
+    def _build_tree(self, element):
         if not hasattr(element, "name") or element.name is None:
             return None
 
-        node = {
-            "tag": element.name,
-            "classes": element.get("class", []),
-            "children": [],
-            "parent": parent,
-        }
+        root = Node(tag=element.name, classes=element.get("class"))
 
-        for child in element.children:
-            child_node = self._build_tree(child, node)
-            if child_node:
-                node["children"].append(child_node)
-        return node
+        # Walk the DOM with an explicit stack so deeply nested pages can't hit the recursion limit.
+        stack = [(element, root)]
+        while stack:
+            element, node = stack.pop()
+            for child in element.children:
+                if getattr(child, "name", None) is None:
+                    continue
+                child_node = Node(tag=child.name, classes=child.get("class"))
+                node.children.append(child_node)
+                stack.append((child, child_node))
+        return root
 
     def get_tree(self):
         return self.root
 
     def export_json(self, filename):
-        # Remove the circular parent references before exporting
-        def remove_parent(node):
-            # Create a new node excluding the "parent" key
-            new_node = {k: v for k, v in node.items() if k != "parent"}
-            # Process children recursively if available
-            if "children" in new_node:
-                new_node["children"] = [remove_parent(child) for child in new_node["children"]]
-            return new_node
-
-        tree_without_parents = remove_parent(self.root)
+        # Convert the Node tree to plain dicts before exporting
+        tree = self.root.to_dict()
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(tree_without_parents, f, indent=2)
+            dump_tree_json(tree, f)
 
     def extract_text_by_blocks(self):
         blocks = {}
-        for block in self.soup.find_all(True):
-            if block.name in ['div', 'p', 'span']:
-                block_text = block.get_text(strip=True)
-                if block_text:
-                    blocks.setdefault(block.name, []).append(block_text)
+        for block in self.soup.find_all(['div', 'p', 'span']):
+            block_text = block.get_text(strip=True)
+            if block_text:
+                blocks.setdefault(block.name, []).append(block_text)
         return blocks
+def dump_tree_json(tree, f, indent=2):
+    """
+    Write a {"tag", "classes", "children"} tree exactly as json.dump(tree, f, indent=indent) would,
+    but with an explicit stack: json.dump recurses once per level and fails on very deep DOMs.
+    """
+    # The stack holds literal strings to write and (node, depth) pairs still to be expanded.
+    stack = [(tree, 0)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            f.write(item)
+            continue
+        node, depth = item
+        pad = " " * (indent * depth)
+        key_pad = " " * (indent * (depth + 1))
+        item_pad = " " * (indent * (depth + 2))
+        classes = node["classes"]
+        classes_json = ("[\n" + ",\n".join(item_pad + json.dumps(c) for c in classes) + "\n" + key_pad + "]"
+                        if classes else "[]")
+        f.write("{\n" + key_pad + '"tag": ' + json.dumps(node["tag"]) + ",\n"
+                + key_pad + '"classes": ' + classes_json + ",\n"
+                + key_pad + '"children": ')
+        children = node["children"]
+        if not children:
+            f.write("[]\n" + pad + "}")
+            continue
+        f.write("[\n")
+        # Queue writes in document order, then push them reversed so they pop in order.
+        pending = []
+        for i, child in enumerate(children):
+            if i:
+                pending.append(",\n")
+            pending.append(item_pad)
+            pending.append((child, depth + 2))
+        pending.append("\n" + key_pad + "]\n" + pad + "}")
+        stack.extend(reversed(pending))
+
+
 def format_node_identifier(node):
     """Format a node's identifier (tag and classes)."""
-    classes = " ".join(node.get("classes", []))
-    return f"{node['tag']} ({classes})" if classes else node["tag"]
+    classes = " ".join(node.classes)
+    return f"{node.tag} ({classes})" if classes else node.tag
 
 
 def tree_to_string(node, prefix="", is_last=True):
     """Convert an HTML tree into a visual tree-like string."""
-    classes_str = f" ({' '.join(node['classes'])})" if node["classes"] else ""
-    tree_str = f"{prefix}{'└── ' if is_last else '├── '}{node['tag']}{classes_str}"
-    children = node.get("children", [])
-    for i, child in enumerate(children):
+    parts = []
+    stack = [(node, prefix, is_last)]
+    while stack:
+        node, prefix, is_last = stack.pop()
+        classes_str = f" ({' '.join(node.classes)})" if node.classes else ""
+        parts.append(f"{prefix}{'└── ' if is_last else '├── '}{node.tag}{classes_str}")
+        children = node.children
         new_prefix = prefix + ("    " if is_last else "│   ")
-        tree_str += "\n" + tree_to_string(child, new_prefix, i == len(children) - 1)
-    return tree_str
-
-
-def get_breadcrumbs(node):
-    """Generate breadcrumb-style path for the current location in the tree."""
-    path = []
-    while node:
-        path.append(format_node_identifier(node))
-        node = node.get("parent")
-    return " > ".join(reversed(path))
+        # Push children in reverse so they are rendered in document order.
+        for i in range(len(children) - 1, -1, -1):
+            stack.append((children[i], new_prefix, i == len(children) - 1))
+    return "\n".join(parts)
 
 
 class HTMLExplorer:
     """Interactive CLI explorer for navigating an HTML tree."""
     def __init__(self, root):
         self.current_node = root
+        # Nodes from the root to current_node, kept in step with change_directory.
+        self._path = deque([root])
+
+    def breadcrumbs(self):
+        """Breadcrumb-style path for the current location, built from the tracked path."""
+        return " > ".join(format_node_identifier(node) for node in self._path)
+
+    def _enter(self, child):
+        self._path.append(child)
+        self.current_node = child
 
     def list_children(self):
-        children = self.current_node.get("children", [])
+        children = self.current_node.children
         if children:
             print("\n📂 Children:")
             for idx, child in enumerate(children):
@@ -404,23 +655,24 @@ class HTMLExplorer:
             print("\n⚠️ No children.")
 
     def change_directory(self, arg):
-        children = self.current_node.get("children", [])
+        children = self.current_node.children
         if arg == "..":
-            if self.current_node.get("parent"):
-                self.current_node = self.current_node["parent"]
+            if len(self._path) > 1:
+                self._path.pop()
+                self.current_node = self._path[-1]
             else:
                 print("⛔ Already at the root.")
         else:
             try:
                 idx = int(arg)
                 if 0 <= idx < len(children):
-                    self.current_node = children[idx]
+                    self._enter(children[idx])
                 else:
                     print("⛔ Index out of range.")
             except ValueError:
-                matching_children = [child for child in children if arg in " ".join(child.get("classes", []))]
+                matching_children = [child for child in children if arg in " ".join(child.classes)]
                 if matching_children:
-                    self.current_node = matching_children[0]
+                    self._enter(matching_children[0])
                 else:
                     print("⛔ No matching class found.")
 
@@ -431,14 +683,14 @@ class HTMLExplorer:
         query = query.lower()
         results = []
 
-        def search_tree(node):
+        stack = [self.current_node]
+        while stack:
+            node = stack.pop()
             identifier = format_node_identifier(node).lower()
             if query in identifier:
                 results.append(node)
-            for child in node.get("children", []):
-                search_tree(child)
+            stack.extend(reversed(node.children))
 
-        search_tree(self.current_node)
         if results:
             print("\n🔍 Search Results:")
             for i, node in enumerate(results):
@@ -448,7 +700,7 @@ class HTMLExplorer:
 
     def start(self):
         while True:
-            print(f"\n📍 Path: {get_breadcrumbs(self.current_node)}")
+            print(f"\n📍 Path: {self.breadcrumbs()}")
             self.list_children()
             command = input("\n🔹 Command (ls, cd <index/class>, cd .., expand, search <text>, exit): ").strip()
             if command.lower() == "ls":
@@ -469,47 +721,95 @@ class HTMLExplorer:
 # ------------------------
 # Training Functions
 # ------------------------
+def shuffled_batches(inputs, labels, batch_size):
+    """Yields (inputs, labels) mini-batches taken from one random permutation of the rows."""
+    perm = torch.randperm(len(inputs), device=inputs.device)
+    for start in range(0, len(inputs), batch_size):
+        idx = perm[start:start + batch_size]
+        yield inputs[idx], labels[idx]
+
+
+def fits_on_device(dataset, device):
+    """True when the dataset's tensors are small enough to move to `device` in one go."""
+    nbytes = dataset.sequences.nbytes + dataset.labels.nbytes
+    if device.type == 'cuda':
+        free_bytes, _ = torch.cuda.mem_get_info(device)
+        return nbytes <= min(MAX_ON_DEVICE_BYTES, free_bytes // 4)
+    return nbytes <= MAX_ON_DEVICE_BYTES
+
+
+def make_batch_source(dataset, batch_size, device):
+    """
+    Returns a callable yielding one epoch of (inputs, labels) batches. Small datasets are moved
+    to the device once and sliced by a per-epoch permutation; larger ones stream through a
+    DataLoader with pinned memory so host-to-device copies overlap with compute.
+    """
+    if fits_on_device(dataset, device):
+        inputs = dataset.sequences.to(device)
+        labels = dataset.labels.to(device)
+        return lambda: shuffled_batches(inputs, labels, batch_size)
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True,
+                        num_workers=max(2, (os.cpu_count() or 1) // 2),
+                        pin_memory=(device.type == 'cuda'), persistent_workers=True, prefetch_factor=2)
+    return lambda: loader
+
+
 def trainFNN(model, dataset, num_epochs, device, batch_size=16, lr=0.001):
-    train_loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=True)
     model.to(device)
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=lr)
+    use_amp = device.type == 'cuda'
+    scaler = torch.amp.GradScaler(device.type, enabled=use_amp)
+
+    batches = make_batch_source(dataset, batch_size, device)
+    num_batches = math.ceil(len(dataset) / batch_size)
 
     for epoch in range(num_epochs):
         epoch_loss = 0.0
-        for words, labels in train_loader:
-            # Cast inputs to float for FNN
-            words = words.to(device).float()
-            labels = labels.to(device)
-            outputs = model(words)
-            loss = criterion(outputs, labels)
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
+        for words, labels in batches():
+            # BoW counts arrive as float16; autocast consumes them directly, the CPU path needs float32
+            words = words.to(device, non_blocking=True)
+            if not use_amp:
+                words = words.float()
+            labels = labels.to(device, non_blocking=True)
+            with torch.autocast(device_type=device.type, dtype=torch.float16, enabled=use_amp):
+                outputs = model(words)
+                loss = criterion(outputs, labels)
+            optimizer.zero_grad(set_to_none=True)
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
             epoch_loss += loss.item()
-        logging.info(f"Epoch {epoch+1}/{num_epochs}, Loss: {epoch_loss/len(train_loader):.4f}")
+        logging.info(f"Epoch {epoch+1}/{num_epochs}, Loss: {epoch_loss/num_batches:.4f}")
     logging.info(f"Final loss: {loss.item():.4f}")
 
 
 def trainCNN(model, dataset, num_epochs, device, batch_size=16, lr=0.001):
-    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
     criterion = nn.BCEWithLogitsLoss()
     optimizer = optim.Adam(model.parameters(), lr=lr)
     model.to(device)
     model.train()
+    use_amp = device.type == 'cuda'
+    scaler = torch.amp.GradScaler(device.type, enabled=use_amp)
+
+    batches = make_batch_source(dataset, batch_size, device)
+    num_batches = math.ceil(len(dataset) / batch_size)
 
     for epoch in range(num_epochs):
         epoch_loss = 0.0
-        for sequences, labels in dataloader:
-            sequences = sequences.to(device)
-            labels = labels.float().to(device).unsqueeze(1)  # Adjust for BCEWithLogitsLoss
-            optimizer.zero_grad()
-            outputs = model(sequences)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
+        for sequences, labels in batches():
+            sequences = sequences.to(device, non_blocking=True)
+            labels = labels.to(device, non_blocking=True).float().unsqueeze(1)  # Adjust for BCEWithLogitsLoss
+            optimizer.zero_grad(set_to_none=True)
+            # BCEWithLogitsLoss is autocast-safe, so the sigmoid stays inside the loss
+            with torch.autocast(device_type=device.type, dtype=torch.float16, enabled=use_amp):
+                outputs = model(sequences)
+                loss = criterion(outputs, labels)
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
             epoch_loss += loss.item()
-        logging.info(f"Epoch {epoch+1}/{num_epochs}, Loss: {epoch_loss/len(dataloader):.4f}")
+        logging.info(f"Epoch {epoch+1}/{num_epochs}, Loss: {epoch_loss/num_batches:.4f}")
 
 
 def save_model_checkpoint(model, word_to_idx, additional_info, filename="model_checkpoint.pth"):
@@ -523,6 +823,17 @@ def save_model_checkpoint(model, word_to_idx, additional_info, filename="model_c
     logging.info(f"Model checkpoint saved to {filename}")
 
 
+def compile_for_training(model):
+    """
+    Specializes the model with torch.compile on CUDA, where max_len, vocab_size and the
+    filter sizes keep the graph static for the whole run. The compiled wrapper shares its
+    parameters with `model`, so checkpoints should still be saved from the original module.
+    """
+    if torch.cuda.is_available():
+        return torch.compile(model, mode='max-autotune', dynamic=False)
+    return model
+
+
 # ------------------------
 # Main Execution
 # ------------------------
@@ -537,6 +848,7 @@ def set_seed(seed):
 
 def main(args):
     set_seed(args.seed)
+    torch.set_float32_matmul_precision('high')  # Allow TF32 matmuls on GPUs that support them
 
     # Check input: Either json_file or url must be provided based on mode.
     if args.mode != "scrape" and not (args.json_file or args.url):
@@ -565,7 +877,7 @@ def main(args):
             hidden_size = 128
             output_size = 2
             model_obj = TextFNN(input_size, hidden_size, output_size)
-            trainFNN(model_obj, dataset, args.epochs, device, args.batch_size, args.lr)
+            trainFNN(compile_for_training(model_obj), dataset, args.epochs, device, args.batch_size, args.lr)
             additional_info = {
                 "input_size": input_size, "hidden_size": hidden_size,
                 "output_size": output_size, "max_len": args.max_len,
@@ -575,7 +887,7 @@ def main(args):
             save_model_checkpoint(model_obj, word_to_idx, additional_info, filename="fnn_checkpoint.pth")
         elif args.mode.lower() == "cnn":
             model_obj = TextCNN(vocab_size=args.vocab_size)
-            trainCNN(model_obj, dataset, args.epochs, device, args.batch_size, args.lr)
+            trainCNN(compile_for_training(model_obj), dataset, args.epochs, device, args.batch_size, args.lr)
             additional_info = {
                 "max_len": args.max_len, "vocab_size": args.vocab_size,
                 "model_type": "CNN"
@@ -589,14 +901,14 @@ def main(args):
             logging.error("URL is required for scraping.")
             return
         try:
+            ensure_punkt()  # Needed by preprocess_text's sentence tokenizer
             text = scrape_text_from_url(args.url, args.proxy)
             logging.info("Extracted raw text from the webpage.")
             processed_text = preprocess_text(text)
             samples = split_into_samples(text)
             logging.info(f"Generated {len(samples)} text samples.")
 
-            scraper = WebScraper(proxy=args.proxy)
-            html = scraper.fetch(args.url)
+            html = fetch_cached(args.url, args.proxy)
             parser_obj = HTMLParser(html)
             class_tree = parser_obj.get_tree()
             tree_str = tree_to_string(class_tree)
@@ -635,7 +947,7 @@ def main(args):
         dataset = ReviewDataset(X, y)
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         model_obj = TextCNN(vocab_size=args.vocab_size)
-        trainCNN(model_obj, dataset, args.epochs, device, args.batch_size, args.lr)
+        trainCNN(compile_for_training(model_obj), dataset, args.epochs, device, args.batch_size, args.lr)
         additional_info = {"max_len": args.max_len, "vocab_size": args.vocab_size, "model_type": "CNN"}
         save_model_checkpoint(model_obj, word_to_idx, additional_info, filename="cnn_checkpoint.pth")
 
@@ -651,7 +963,7 @@ def main(args):
         hidden_size = 128
         output_size = 2
         model_obj = TextFNN(input_size, hidden_size, output_size)
-        trainFNN(model_obj, dataset, args.epochs, device, args.batch_size, args.lr)
+        trainFNN(compile_for_training(model_obj), dataset, args.epochs, device, args.batch_size, args.lr)
         additional_info = {
             "input_size": input_size, "hidden_size": hidden_size,
             "output_size": output_size, "max_len": args.max_len,